@@ -1,12 +1,22 @@
 import streamlit as st
+import orjson
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import pandas as pd
 import tldextract
 import psycopg2
-from collections import defaultdict
+from psycopg2 import pool
+from psycopg2.extras import execute_values
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.parse import urlsplit
+import csv
 import datetime
+import hashlib
+import io
 import os
-import plotly.graph_objects as go
+import plotly.express as px
 # Add at the top of your app.py
 import logging
 import sys
@@ -22,108 +32,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger("job-tracker")
 
-# Then add throughout your code:
+# ✅ Shared HTTP session so every SerpAPI call reuses one keep-alive TLS connection
+_SERPAPI_SESSION = requests.Session()
+_SERPAPI_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# ✅ Resolved once per process; validated at the call site so the read-only dashboard still loads
+SERP_API_KEY = os.getenv("SERP_API_KEY")
+_SERPAPI_URL = "https://serpapi.com/search"
+_SERPAPI_BASE_PARAMS = {
+    "engine": "google_jobs",
+    "hl": "en",
+    "api_key": SERP_API_KEY
+}
 
-# In get_google_jobs_results function:
-def get_google_jobs_results(query, location):
-    logger.info(f"Fetching results for query: {query} in location: {location}")
-    SERP_API_KEY = os.getenv("SERP_API_KEY")
-    
-    if not SERP_API_KEY:
-        logger.error("SERP_API_KEY is not set!")
-        raise ValueError("❌ ERROR: SERP_API_KEY environment variable is not set!")
-    
-    # Log a masked version of the key for debugging
-    logger.info(f"Using SERP API key: {SERP_API_KEY[:4]}...{SERP_API_KEY[-4:]}")
-    
-    url = "https://serpapi.com/search"
-    params = {
-        "engine": "google_jobs",
-        "q": query,
-        "location": location,
-        "hl": "en",
-        "api_key": SERP_API_KEY
-    }
-    
-    logger.info(f"Sending request to SerpAPI with params: {params}")
-    
-    response = requests.get(url, params=params)
-    
-    logger.info(f"SerpAPI response status code: {response.status_code}")
-    
-    if response.status_code != 200:
-        logger.error(f"Failed to fetch data from SerpAPI. Status Code: {response.status_code}")
-        logger.error(f"Response content: {response.text}")
-        raise RuntimeError(f"❌ ERROR: Failed to fetch data from SerpAPI. Status Code: {response.status_code}")
-    
-    results = response.json().get("jobs_results", [])
-    logger.info(f"Received {len(results)} job results")
-    return results
-
-# In compute_sov function:
-def compute_sov():
-    logger.info("Starting compute_sov function")
-    domain_sov = defaultdict(float)
-    domain_appearances = defaultdict(int)
-    domain_v_rank = defaultdict(list)
-    domain_h_rank = defaultdict(list)
-
-    jobs_data = load_jobs()
-    logger.info(f"Loaded {len(jobs_data)} job queries from CSV")
-    
-    total_sov = 0
-
-    for job_query in jobs_data:
-        job_title = job_query["job_title"]
-        location = job_query["location"]
-        logger.info(f"Processing job query: {job_title} in {location}")
-
-        try:
-            jobs = get_google_jobs_results(job_title, location)
-            logger.info(f"Retrieved {len(jobs)} job results for query")
-            
-            if not jobs:
-                logger.warning(f"No jobs found for query: {job_title} in {location}")
-            
-            # Rest of your function...
-            
-        except Exception as e:
-            logger.error(f"Error processing job query {job_title}: {str(e)}")
-            continue
-
-    logger.info(f"Computed SoV for {len(domain_sov)} domains with total SoV: {total_sov}")
-    return domain_sov, domain_appearances, domain_avg_v_rank, domain_avg_h_rank
-
-# In save_to_db function:
-def save_to_db(sov_data, appearances, avg_v_rank, avg_h_rank):
-    logger.info(f"Saving data for {len(sov_data)} domains to database")
-    
-    if not sov_data:
-        logger.warning("No SoV data to save to database")
-        return
-        
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        today = datetime.date.today()
-        logger.info(f"Saving data for date: {today}")
-
-        for domain in sov_data:
-            logger.info(f"Inserting data for domain: {domain}, SoV: {sov_data[domain]}")
-            cursor.execute("""
-                INSERT INTO share_of_voice (domain, sov, appearances, avg_v_rank, avg_h_rank, date)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (domain, round(sov_data[domain], 2), appearances[domain], 
-                  avg_v_rank[domain], avg_h_rank[domain], today))
-
-        conn.commit()
-        logger.info("Database commit successful")
-        cursor.close()
-        conn.close()
-    except Exception as e:
-        logger.error(f"Database error: {str(e)}")
-        raise
 # Display Logo
 st.image("logo.png", width=200)  # Adjust width as needed
 
@@ -132,38 +57,64 @@ DB_URL = os.getenv("DB_URL")
 if not DB_URL:
     raise ValueError("❌ ERROR: DB_URL environment variable is not set!")
 
+# ✅ Shared Connection Pool (kept alive across Streamlit reruns)
+@st.cache_resource
+def get_connection_pool():
+    return pool.ThreadedConnectionPool(1, 10, DB_URL, sslmode="require")
+
 # ✅ Define Database Connection Function
+@contextmanager
 def get_db_connection():
-    return psycopg2.connect(DB_URL, sslmode="require")
+    db_pool = get_connection_pool()
+    conn = db_pool.getconn()
+    try:
+        yield conn
+    finally:
+        db_pool.putconn(conn)
 
-# ✅ Ensure Table Exists & Schema is Updated
+# ✅ Ensure Table Exists & Schema is Updated (once per process, not on every rerun)
+@st.cache_resource
 def initialize_database():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS share_of_voice (
-            id SERIAL PRIMARY KEY,
-            domain TEXT NOT NULL,
-            sov FLOAT NOT NULL,
-            appearances INT DEFAULT 0,
-            avg_v_rank FLOAT DEFAULT 0,
-            avg_h_rank FLOAT DEFAULT 0,
-            date DATE NOT NULL
-        );
-    """)
-
-    cursor.execute("ALTER TABLE share_of_voice ADD COLUMN IF NOT EXISTS appearances INT DEFAULT 0;")
-    cursor.execute("ALTER TABLE share_of_voice ADD COLUMN IF NOT EXISTS avg_v_rank FLOAT DEFAULT 0;")
-    cursor.execute("ALTER TABLE share_of_voice ADD COLUMN IF NOT EXISTS avg_h_rank FLOAT DEFAULT 0;")
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS share_of_voice (
+                id SERIAL PRIMARY KEY,
+                domain TEXT NOT NULL,
+                sov FLOAT NOT NULL,
+                appearances INT DEFAULT 0,
+                avg_v_rank FLOAT DEFAULT 0,
+                avg_h_rank FLOAT DEFAULT 0,
+                date DATE NOT NULL
+            );
+        """)
+
+        cursor.execute("DROP INDEX IF EXISTS idx_sov_date;")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sov_date_domain ON share_of_voice (date, domain);")
+
+        # ✅ Enforce one row per (domain, date) so daily runs upsert instead of duplicating.
+        # Legacy tables may hold duplicates, so dedupe once before the unique index exists.
+        cursor.execute("SELECT to_regclass('uq_sov_domain_date');")
+        if cursor.fetchone()[0] is None:
+            cursor.execute("""
+                DELETE FROM share_of_voice a
+                USING share_of_voice b
+                WHERE a.domain = b.domain AND a.date = b.date AND a.id < b.id;
+            """)
+            cursor.execute("CREATE UNIQUE INDEX uq_sov_domain_date ON share_of_voice (domain, date);")
+
+        conn.commit()
+        cursor.close()
 
 initialize_database()
 
-# ✅ Load job queries from CSV
+# ✅ Load job queries from CSV (cached on the file's mtime so edits invalidate the cache)
+@st.cache_data
+def _load_jobs_cached(file_mtime):
+    df = pd.read_csv("jobs.csv", usecols=["job_title", "location"], dtype="string")
+    return df.to_dict(orient="records")
+
 def load_jobs():
     file_path = "jobs.csv"
 
@@ -171,156 +122,258 @@ def load_jobs():
         st.error(f"⚠️ File '{file_path}' not found! Please ensure it exists in the project folder.")
         return []
 
-    df = pd.read_csv(file_path)
-    return df.to_dict(orient="records")
+    return _load_jobs_cached(os.path.getmtime(file_path))
+
+# ✅ On-disk cache so same-day re-runs don't re-spend the SerpAPI budget
+SERP_CACHE_DIR = ".serp_cache"
+
+def _serp_cache_path(query, location):
+    key = hashlib.sha1(f"{query}|{location}|{datetime.date.today().isoformat()}".encode()).hexdigest()
+    return os.path.join(SERP_CACHE_DIR, f"{key}.json")
 
 # ✅ Fetch Google Jobs Results from SerpAPI
 def get_google_jobs_results(query, location):
-    SERP_API_KEY = os.getenv("SERP_API_KEY")  
+    logger.info(f"Fetching results for query: {query} in location: {location}")
 
     if not SERP_API_KEY:
+        logger.error("SERP_API_KEY is not set!")
         raise ValueError("❌ ERROR: SERP_API_KEY environment variable is not set!")
 
-    url = "https://serpapi.com/search"
-    params = {
-        "engine": "google_jobs",
-        "q": query,
-        "location": location,
-        "hl": "en",
-        "api_key": SERP_API_KEY
-    }
-    
-    response = requests.get(url, params=params)
+    cache_path = _serp_cache_path(query, location)
+    if os.path.exists(cache_path):
+        logger.info(f"Using cached results for query: {query} in location: {location}")
+        with open(cache_path, "rb") as f:
+            return orjson.loads(f.read())
+
+    params = {**_SERPAPI_BASE_PARAMS, "q": query, "location": location}
+
+    response = _SERPAPI_SESSION.get(_SERPAPI_URL, params=params, timeout=30)
 
     if response.status_code != 200:
+        logger.error(f"Failed to fetch data from SerpAPI. Status Code: {response.status_code}")
+        logger.error(f"Response content: {response.text}")
         raise RuntimeError(f"❌ ERROR: Failed to fetch data from SerpAPI. Status Code: {response.status_code}")
 
-    return response.json().get("jobs_results", [])
+    results = orjson.loads(response.content).get("jobs_results", [])
+    logger.info(f"Received {len(results)} job results")
+
+    os.makedirs(SERP_CACHE_DIR, exist_ok=True)
+    with open(cache_path, "wb") as f:
+        f.write(orjson.dumps(results))
+
+    return results
+
+# ✅ Max number of SerpAPI requests in flight at once
+MAX_FETCH_WORKERS = 16
 
 # ✅ Compute Share of Voice & Additional Metrics
 def compute_sov():
-    domain_sov = defaultdict(float)
-    domain_appearances = defaultdict(int)
-    domain_v_rank = defaultdict(list)
-    domain_h_rank = defaultdict(list)
-
     jobs_data = load_jobs()
-    total_sov = 0  
-
-    for job_query in jobs_data:
-        job_title = job_query["job_title"]
-        location = job_query["location"]
+    logger.info(f"Loaded {len(jobs_data)} job queries from CSV")
 
-        jobs = get_google_jobs_results(job_title, location)
+    # ✅ Duplicate (job_title, location) rows in the CSV reuse one fetch instead of re-hitting the paid API
+    unique_queries = list({(job_query["job_title"], job_query["location"]) for job_query in jobs_data})
 
-        for job_rank, job in enumerate(jobs, start=1):
-            apply_options = job.get("apply_options", [])
+    # ✅ One failed query shouldn't throw away every other result in the run
+    def fetch_jobs(query_pair):
+        job_title, location = query_pair
+        try:
+            jobs = get_google_jobs_results(job_title, location)
+            if not jobs:
+                logger.warning(f"No jobs found for query: {job_title} in {location}")
+            return jobs
+        except Exception as e:
+            logger.error(f"Error fetching '{job_title}' in '{location}': {str(e)}")
+            return []
+
+    # ✅ Fetch all queries concurrently (the work is network-bound, not CPU-bound)
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        results_by_query = dict(zip(unique_queries, executor.map(fetch_jobs, unique_queries)))
+
+    all_results = [results_by_query[(job_query["job_title"], job_query["location"])] for job_query in jobs_data]
+
+    # ✅ Flatten results into (domain, v_rank, h_rank) records; aggregation happens in pandas
+    records = [
+        (extract_domain(option["link"]), job_rank, link_order)
+        for jobs in all_results
+        for job_rank, job in enumerate(jobs, start=1)
+        for link_order, option in enumerate(job.get("apply_options", []), start=1)
+        if "link" in option
+    ]
 
-            V = 1 / job_rank  
+    if not records:
+        return {}, {}, {}, {}
 
-            for link_order, option in enumerate(apply_options, start=1):
-                if "link" in option:
-                    domain = extract_domain(option["link"])
-                    H = 1 / link_order  
+    df = pd.DataFrame.from_records(records, columns=["domain", "v_rank", "h_rank"])
+    df["weight"] = 1.0 / (df["v_rank"].values * df["h_rank"].values)
 
-                    weight = V * H  
-                    domain_sov[domain] += weight  
-                    domain_appearances[domain] += 1
-                    domain_v_rank[domain].append(job_rank)
-                    domain_h_rank[domain].append(link_order)
-                    total_sov += weight  
+    grouped = df.groupby("domain", sort=False)
+    sov = grouped["weight"].sum()
+    total_sov = sov.sum()
 
-    if total_sov > 0:
-        domain_sov = {domain: round((sov / total_sov) * 100, 4) for domain, sov in domain_sov.items()}
-    
-    domain_avg_v_rank = {domain: round(sum(vr) / len(vr), 2) for domain, vr in domain_v_rank.items()}
-    domain_avg_h_rank = {domain: round(sum(hr) / len(hr), 2) for domain, hr in domain_h_rank.items()}
+    domain_sov = (sov * (100.0 / total_sov)).round(4).to_dict()
+    domain_appearances = grouped.size().to_dict()
+    domain_avg_v_rank = grouped["v_rank"].mean().round(2).to_dict()
+    domain_avg_h_rank = grouped["h_rank"].mean().round(2).to_dict()
 
+    logger.info(f"Computed SoV for {len(domain_sov)} domains")
     return domain_sov, domain_appearances, domain_avg_v_rank, domain_avg_h_rank
 
+# ✅ Single TLDExtract instance built once per process (bundled suffix list, no network fetch)
+_TLD_EXTRACT = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None, include_psl_private_domains=False)
+
+# ✅ Registrable domains that dominate Google Jobs apply links — matched before the suffix-list walk
+_KNOWN_ATS_DOMAINS = {
+    "ashbyhq.com", "bamboohr.com", "glassdoor.com", "greenhouse.io", "icims.com",
+    "indeed.com", "jobvite.com", "lever.co", "linkedin.com", "monster.com",
+    "myworkdayjobs.com", "smartrecruiters.com", "workable.com", "workday.com", "ziprecruiter.com",
+}
+
+# ✅ Common single-label public suffixes where the registrable domain is just the last two labels
+_SINGLE_LABEL_SUFFIXES = {"com", "org", "net", "io", "co", "ai", "dev", "jobs", "careers"}
+
+# ✅ Full public-suffix set, materialized once on first use
+@lru_cache(maxsize=1)
+def _public_suffixes():
+    return frozenset(_TLD_EXTRACT.tlds)
+
+# ✅ Resolve a hostname to its registrable domain (cached — URLs differ far more often than hosts)
+@lru_cache(maxsize=16384)
+def _domain_from_host(host):
+    # Fast path: match the host's suffixes against the known ATS set (a dict lookup per label)
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        candidate = ".".join(parts[i:])
+        if candidate in _KNOWN_ATS_DOMAINS:
+            return candidate
+
+    # Fast path: single-label TLDs cover most remaining hosts without a suffix-list walk.
+    # Skip it when the two-label tail is itself a public suffix (com.co, com.ai, ...) —
+    # those hosts need the full walk to find the real registrable domain.
+    if len(parts) >= 2 and parts[-1] in _SINGLE_LABEL_SUFFIXES:
+        tail = f"{parts[-2]}.{parts[-1]}"
+        if tail not in _public_suffixes():
+            return tail
+
+    extracted = _TLD_EXTRACT(host)
+    domain = f"{extracted.domain}.{extracted.suffix}" if extracted.suffix else extracted.domain
+    return domain.lower().removeprefix("www.")
+
 # ✅ Extract Domain from URL
 def extract_domain(url):
-    extracted = tldextract.extract(url)
-    domain = f"{extracted.domain}.{extracted.suffix}" if extracted.suffix else extracted.domain
-    return domain.lower().replace("www.", "")
+    host = (urlsplit(url).hostname or "").lower()
+    return _domain_from_host(host)
+
+# ✅ Row count above which save_to_db switches from execute_values to COPY
+COPY_THRESHOLD = 1000
 
 # ✅ Store Data in Database
 def save_to_db(sov_data, appearances, avg_v_rank, avg_h_rank):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    logger.info(f"Saving data for {len(sov_data)} domains to database")
 
-    today = datetime.date.today()
+    if not sov_data:
+        logger.warning("No SoV data to save to database")
+        return
 
-    for domain in sov_data:
-        cursor.execute("""
-            INSERT INTO share_of_voice (domain, sov, appearances, avg_v_rank, avg_h_rank, date)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (domain, round(sov_data[domain], 2), appearances[domain], avg_v_rank[domain], avg_h_rank[domain], today))
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        today = datetime.date.today()
 
-# ✅ Retrieve Historical Data
-def get_historical_data(start_date, end_date):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_name = 'share_of_voice'
-        );
-    """)
-    
-    table_exists = cursor.fetchone()[0]
-    
-    if not table_exists:
-        st.warning("⚠️ No data available yet.")
+        # ✅ Insert all domains in a single round-trip instead of one INSERT per row
+        rows = [
+            (domain, round(sov_data[domain], 2), appearances[domain], avg_v_rank[domain], avg_h_rank[domain], today)
+            for domain in sov_data
+        ]
+
+        if len(rows) >= COPY_THRESHOLD:
+            # ✅ COPY skips per-row INSERT parsing — fastest bulk path for large batches.
+            # COPY can't upsert directly, so stage the rows and merge with ON CONFLICT.
+            cursor.execute("""
+                CREATE TEMP TABLE share_of_voice_staging
+                (LIKE share_of_voice INCLUDING DEFAULTS EXCLUDING INDEXES)
+                ON COMMIT DROP;
+            """)
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert("""
+                COPY share_of_voice_staging (domain, sov, appearances, avg_v_rank, avg_h_rank, date)
+                FROM STDIN WITH (FORMAT CSV)
+            """, buffer)
+            cursor.execute("""
+                INSERT INTO share_of_voice (domain, sov, appearances, avg_v_rank, avg_h_rank, date)
+                SELECT domain, sov, appearances, avg_v_rank, avg_h_rank, date
+                FROM share_of_voice_staging
+                ON CONFLICT (domain, date) DO UPDATE SET
+                    sov = EXCLUDED.sov,
+                    appearances = EXCLUDED.appearances,
+                    avg_v_rank = EXCLUDED.avg_v_rank,
+                    avg_h_rank = EXCLUDED.avg_h_rank;
+            """)
+        else:
+            execute_values(cursor, """
+                INSERT INTO share_of_voice (domain, sov, appearances, avg_v_rank, avg_h_rank, date)
+                VALUES %s
+                ON CONFLICT (domain, date) DO UPDATE SET
+                    sov = EXCLUDED.sov,
+                    appearances = EXCLUDED.appearances,
+                    avg_v_rank = EXCLUDED.avg_v_rank,
+                    avg_h_rank = EXCLUDED.avg_h_rank
+            """, rows, page_size=1000)
+
+        conn.commit()
+        logger.info("Database commit successful")
         cursor.close()
-        conn.close()
-        return pd.DataFrame(), pd.DataFrame()
 
-    query = """
-        SELECT domain, date, sov, appearances, avg_v_rank, avg_h_rank
-        FROM share_of_voice 
-        WHERE date BETWEEN %s AND %s
-    """
-    cursor.execute(query, (start_date, end_date))
-    rows = cursor.fetchall()
+# ✅ Retrieve Historical Data (memoized per date range so reruns skip the DB)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_historical_data(start_date, end_date):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
 
-    df = pd.DataFrame(rows, columns=["domain", "date", "sov", "appearances", "avg_v_rank", "avg_h_rank"])
+        # ✅ Aggregate duplicate (domain, date) pairs server-side instead of in pandas
+        query = """
+            SELECT domain, date,
+                   AVG(sov) AS sov,
+                   SUM(appearances) AS appearances,
+                   AVG(avg_v_rank) AS avg_v_rank,
+                   AVG(avg_h_rank) AS avg_h_rank
+            FROM share_of_voice
+            WHERE date BETWEEN %s AND %s
+            GROUP BY domain, date
+        """
+        cursor.execute(query, (start_date, end_date))
+        df_agg = pd.DataFrame.from_records(cursor.fetchall(), columns=[col.name for col in cursor.description])
 
-    cursor.close()
-    conn.close()
+        cursor.close()
 
-    # ✅ Convert 'date' column to only show the date (no hours)
-    df["date"] = pd.to_datetime(df["date"]).dt.date  
+    # ✅ Empty range: slicing value blocks out of an empty reshape raises KeyError,
+    # so return empty frames and let the UI show its empty-state message
+    if df_agg.empty:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
-    # ✅ Aggregate duplicate (domain, date) pairs before pivoting
-    df_agg = df.groupby(["domain", "date"], as_index=False).agg({
-        "sov": "mean",
-        "appearances": "sum",
-        "avg_v_rank": "mean",
-        "avg_h_rank": "mean"
-    })
+    # ✅ Convert 'date' column to only show the date (no hours)
+    df_agg["date"] = pd.to_datetime(df_agg["date"]).dt.date
 
-    # ✅ Pivot for SoV Table (Domains as rows, Dates as columns)
-    df_sov = df_agg.pivot(index="domain", columns="date", values="sov").fillna(0)
+    # ✅ Narrow dtypes before pivoting: float32 metrics and integer-hashed categorical domains
+    df_agg["domain"] = df_agg["domain"].astype("category")
+    for col in ("sov", "appearances", "avg_v_rank", "avg_h_rank"):
+        df_agg[col] = df_agg[col].astype("float32")
 
-    # ✅ Pivot for Metrics Table (Fixing Column Order)
-    df_metrics = df_agg.pivot(index="domain", columns="date", values=["appearances", "avg_v_rank", "avg_h_rank"]).fillna(0)
+    # ✅ One reshape serves every output: unstack once (Domains as rows, Dates as columns), then slice
+    wide = df_agg.set_index(["domain", "date"]).unstack("date", fill_value=0)
+    df_sov = wide["sov"]
+    df_appearances = wide["appearances"]
 
-    # ✅ Swap column levels to put dates at the top
-    df_metrics = df_metrics.swaplevel(axis=1).sort_index(axis=1)
+    # ✅ Metrics Table: swap column levels to put dates at the top
+    df_metrics = wide[["appearances", "avg_v_rank", "avg_h_rank"]].swaplevel(axis=1).sort_index(axis=1)
 
     # ✅ Sort SoV table by the most recent date’s SoV values (if data exists)
     if not df_sov.empty:
-        most_recent_date = df_sov.columns[-1]  
+        most_recent_date = df_sov.columns[-1]
         df_sov = df_sov.sort_values(by=most_recent_date, ascending=False)
-
-    # ✅ Create appearances pivot table
-    df_appearances = df_agg.pivot(index="domain", columns="date", values="appearances").fillna(0)
+        df_appearances = df_appearances.loc[df_sov.index]
 
     return df_sov, df_metrics, df_appearances
 
@@ -336,6 +389,7 @@ end_date = st.sidebar.date_input("End Date", datetime.date(2025, 2, 28))
 if st.button("Fetch & Store Data"):
     sov_data, appearances, avg_v_rank, avg_h_rank = compute_sov()
     save_to_db(sov_data, appearances, avg_v_rank, avg_h_rank)
+    get_historical_data.clear()  # the cached range data is stale after a save
     st.success("Data stored successfully!")
 
 # ✅ Show Historical Trends
@@ -345,15 +399,10 @@ df_sov, df_metrics, df_appearances = get_historical_data(start_date, end_date)
 if not df_sov.empty:
     # First chart: Share of Voice
     top_domains = df_sov.iloc[:15]
-    fig1 = go.Figure()
 
-    for domain in top_domains.index:
-        fig1.add_trace(go.Scatter(
-            x=top_domains.columns, 
-            y=top_domains.loc[domain], 
-            mode="markers+lines", 
-            name=domain
-        ))
+    # ✅ One vectorized px.line call builds all traces at once (WebGL rendering preserved)
+    sov_long = top_domains.reset_index().melt(id_vars="domain", var_name="date", value_name="sov")
+    fig1 = px.line(sov_long, x="date", y="sov", color="domain", markers=True, render_mode="webgl")
 
     fig1.update_layout(
         title="Domains visibility over time",
@@ -390,15 +439,11 @@ if not df_sov.empty:
     # Second chart: Appearances
     st.write("### Appearances Over Time")
     top_domains_appearances = df_appearances.loc[top_domains.index]  # Use same top domains as SoV chart
-    fig2 = go.Figure()
-
-    for domain in top_domains_appearances.index:
-        fig2.add_trace(go.Scatter(
-            x=top_domains_appearances.columns,
-            y=top_domains_appearances.loc[domain],
-            mode="markers+lines",
-            name=domain
-        ))
+
+    appearances_long = top_domains_appearances.reset_index().melt(
+        id_vars="domain", var_name="date", value_name="appearances"
+    )
+    fig2 = px.line(appearances_long, x="date", y="appearances", color="domain", markers=True, render_mode="webgl")
 
     fig2.update_layout(
         title="Domain Appearances Over Time",